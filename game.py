@@ -1,14 +1,48 @@
 from __future__ import annotations
-from typing import Optional, TYPE_CHECKING
+from functools import lru_cache
+from typing import Any, Optional, TYPE_CHECKING
 import os
 import pygame
 from networking import NetWorking
 from player import Player
+import protocol
 
 # if TYPE_CHECKING:
 #     from player import Player
 
 
+@lru_cache(maxsize=16)
+def _get_font(name: str, size: int) -> pygame.font.Font:
+    """
+    Load a system font once and reuse it for later draws.
+
+    Args:
+        name (str): Font name.
+        size (int): Font size.
+
+    Returns:
+        pygame.font.Font: The loaded font.
+    """
+    return pygame.font.SysFont(name, size)
+
+
+@lru_cache(maxsize=256)
+def _render_text(text: str, color: str, name: str, size: int) -> pygame.Surface:
+    """
+    Render text once and reuse the surface while the text does not change.
+
+    Args:
+        text (str): Text to render.
+        color (str): Text color.
+        name (str): Font name.
+        size (int): Font size.
+
+    Returns:
+        pygame.Surface: The rendered text.
+    """
+    return _get_font(name, size).render(text, True, color)
+
+
 class Game:
     """
     Multiplayer Game class using pygame for graphics and sound, and a custom networking module for communication.
@@ -25,6 +59,11 @@ class Game:
     SPEED: int = 5
     SCREEN_COLOR: str = "darkblue"
     PLAYER_RADIUS: int = 20
+    # Limits of a player's center so the whole circle stays on screen
+    MIN_X: int = PLAYER_RADIUS
+    MAX_X: int = WIDTH - PLAYER_RADIUS
+    MIN_Y: int = PLAYER_RADIUS
+    MAX_Y: int = HEIGHT - PLAYER_RADIUS
 
     def __init__(self) -> None:
         """
@@ -33,7 +72,18 @@ class Game:
         pygame.init()
         self.players: list[Player] = []
         self.player: Optional[Player] = None
+        # Pre-rendered player discs, one per color
+        self._circle_cache: dict[Any, pygame.Surface] = {}
+        # Remote players by name, kept in step with self.players
+        self._by_name: dict[str, Player] = {}
+        # Wire ids assigned by the server: ours, and the names behind all others
+        self.player_id: Optional[int] = None
+        self.player_names: dict[int, str] = {}
+        # Keys currently held down, tracked from KEYDOWN/KEYUP events
+        self._pressed: set[int] = set()
         self.running: bool = True
+        # Set whenever a player is added, moved or removed since the last draw
+        self._dirty: bool = True
         self.init_screen()
         self.init_sound()
         self.connect()
@@ -66,6 +116,8 @@ class Game:
         self.screen = pygame.display.set_mode(self.SIZE)
         pygame.display.set_caption(self.TITLE)
         self.fps_clock = pygame.time.Clock()
+        # Areas drawn on the last frame; the whole screen must be cleared first
+        self._prev_rects: list[pygame.Rect] = [self.screen.get_rect()]
 
     def show_main_menu(self) -> None:
         """
@@ -179,7 +231,7 @@ class Game:
                     elif event.key == pygame.K_BACKSPACE:
                         player_name = player_name[:-1]
                     else:
-                        if len(player_name) < 16 and (
+                        if len(player_name) < protocol.MAX_NAME_LENGTH and (
                             event.unicode.isalnum() or event.unicode == "_"
                         ):
                             player_name += event.unicode
@@ -199,29 +251,42 @@ class Game:
     def handle_move(self) -> None:
         """
         Handle user keyboard input for movement and update player position accordingly.
+
+        Uses the keys tracked by handle_events instead of polling the keyboard state.
         """
-        keys = pygame.key.get_pressed()
-        if self.player is not None:
-            dx = dy = 0
-            if keys[pygame.K_UP]:
-                dy -= self.SPEED
-            if keys[pygame.K_DOWN]:
-                dy += self.SPEED
-            if keys[pygame.K_LEFT]:
-                dx -= self.SPEED
-            if keys[pygame.K_RIGHT]:
-                dx += self.SPEED
+        pressed = self._pressed
+        if self.player is not None and pressed:
+            dx = ((pygame.K_RIGHT in pressed) - (pygame.K_LEFT in pressed)) * self.SPEED
+            dy = ((pygame.K_DOWN in pressed) - (pygame.K_UP in pressed)) * self.SPEED
             if dx != 0 or dy != 0:
                 self.move_player(self.player, dx, dy)
 
-    def handle_quit(self) -> None:
+    def handle_events(self, events: list[pygame.event.Event]) -> None:
         """
-        Handle quit events (window close or ESC key).
-        """
-        for events in pygame.event.get():
-            if events.type == pygame.QUIT or (
-                events.type == pygame.KEYDOWN and events.key == pygame.K_ESCAPE
-            ):
+        Handle the events of the current frame in a single pass.
+
+        Quit events (window close or ESC key) stop the game loop, key presses
+        and releases update the set of held keys used for movement, and expose
+        events schedule a full repaint of the window.
+
+        Args:
+            events (list[pygame.event.Event]): Events fetched once per frame.
+        """
+        for event in events:
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    self.running = False
+                self._pressed.add(event.key)
+            elif event.type == pygame.KEYUP:
+                self._pressed.discard(event.key)
+            elif event.type == pygame.WINDOWFOCUSLOST:
+                # Releases are not reported while the window is unfocused
+                self._pressed.clear()
+            elif event.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE):
+                # The window contents were lost, so repaint the whole screen once
+                self._dirty = True
+                self._prev_rects = [self.screen.get_rect()]
+            elif event.type == pygame.QUIT:
                 self.running = False
 
     def add_player(self, player: Player) -> None:
@@ -238,10 +303,12 @@ class Game:
         if not self.players:
             self.player = player
             self.players.append(player)
-            self.network.send(f"JOIN,{player.name}")
-        else:
-            if player not in self.players:
-                self.players.insert(0, player)
+            self.network.send(protocol.join(player.name))
+            self._dirty = True
+        elif player.name not in self._by_name:
+            self._by_name[player.name] = player
+            self.players.insert(0, player)
+            self._dirty = True
 
     def move_player(self, player: Player, dx: int, dy: int) -> None:
         """
@@ -252,17 +319,22 @@ class Game:
             dx (int): Change in X position.
             dy (int): Change in Y position.
         """
-        new_x = max(
-            self.PLAYER_RADIUS, min(self.WIDTH - self.PLAYER_RADIUS, player.x + dx)
-        )
-        new_y = max(
-            self.PLAYER_RADIUS, min(self.HEIGHT - self.PLAYER_RADIUS, player.y + dy)
-        )
+        new_x = player.x + dx
+        if new_x < self.MIN_X:
+            new_x = self.MIN_X
+        elif new_x > self.MAX_X:
+            new_x = self.MAX_X
+        new_y = player.y + dy
+        if new_y < self.MIN_Y:
+            new_y = self.MIN_Y
+        elif new_y > self.MAX_Y:
+            new_y = self.MAX_Y
 
         moved: bool = (new_x != player.x) or (new_y != player.y)
         player.move(new_x - player.x, new_y - player.y)
 
         if moved:
+            self._dirty = True
             self.send_position()
             if self.move_sound:
                 self.move_sound.stop()
@@ -276,7 +348,7 @@ class Game:
         color: str = "white",
         size: int = 16,
         name: str = "Arial",
-    ) -> None:
+    ) -> pygame.Rect:
         """
         Draw text on the game screen.
 
@@ -287,90 +359,136 @@ class Game:
             color (str): Text color.
             size (int): Font size.
             name (str): Font name.
+
+        Returns:
+            pygame.Rect: The area of the screen covered by the text.
         """
-        text_font = pygame.font.SysFont(name, size)
-        img = text_font.render(text, True, color)
+        img = _render_text(text, color, name, size)
         rect = img.get_rect(center=(x, y))
-        self.screen.blit(img, rect)
+        return self.screen.blit(img, rect)
 
     def draw_screen(self) -> None:
         """
         Render all players and UI elements on the screen.
-        """
-        self.screen.fill(self.SCREEN_COLOR)
 
-        for player in self.players:
-            if self.player is not None and player.name == self.player.name:
-                continue
-            self.draw_player(self.screen, player)
-            self.draw_text(player.name, player.x, player.y - self.PLAYER_RADIUS - 15)
+        Only the areas covered by players on the previous and current frame are
+        redrawn and pushed to the display. Nothing is redrawn unless a player was
+        added, moved or removed; the frame clock still sleeps out the frame.
+        """
+        if self._dirty:
+            self._dirty = False
+            for rect in self._prev_rects:
+                self.screen.fill(self.SCREEN_COLOR, rect)
+
+            screen = self.screen
+            own_player = self.player
+            label_offset = self.PLAYER_RADIUS + 15
+            rects: list[pygame.Rect] = []
+            for player in self.players:
+                if player is own_player:
+                    continue
+                rects.append(self.draw_player(screen, player))
+                rects.append(
+                    self.draw_text(player.name, player.x, player.y - label_offset)
+                )
 
-        if self.player is not None:
-            self.draw_player(self.screen, self.player)
-            self.draw_text(
-                self.player.name,
-                self.player.x,
-                self.player.y - self.PLAYER_RADIUS - 15,
-                color="green",
-            )
-        # Update screen rendering
-        pygame.display.flip()
+            if own_player is not None:
+                rects.append(self.draw_player(screen, own_player))
+                rects.append(
+                    self.draw_text(
+                        own_player.name,
+                        own_player.x,
+                        own_player.y - label_offset,
+                        color="green",
+                    )
+                )
+            # Update screen rendering
+            pygame.display.update(self._prev_rects + rects)
+            self._prev_rects = rects
         self.fps_clock.tick(self.FPS)
 
-    def draw_player(self, screen: pygame.Surface, player: Player) -> None:
+    def draw_player(self, screen: pygame.Surface, player: Player) -> pygame.Rect:
         """
         Draw a player as a circle on the screen.
 
         Args:
             screen (pygame.Surface): The surface to draw on.
             player (Player): The player object.
+
+        Returns:
+            pygame.Rect: The area of the screen covered by the player.
         """
-        pygame.draw.circle(screen, player.color, player.position(), self.PLAYER_RADIUS)
+        radius = self.PLAYER_RADIUS
+        return screen.blit(
+            self._get_circle(player.color), (player.x - radius, player.y - radius)
+        )
+
+    def _get_circle(self, color: Any) -> pygame.Surface:
+        """
+        Get the pre-rendered disc for a player color, rendering it on first use.
+
+        Args:
+            color (Any): The player's color (can be a string, tuple, or pygame.Color).
+
+        Returns:
+            pygame.Surface: A transparent surface holding the disc.
+        """
+        # pygame.Color and lists are not hashable, so non-string colors are keyed
+        # by their RGBA values
+        key = color if isinstance(color, str) else tuple(pygame.Color(color))
+        circle = self._circle_cache.get(key)
+        if circle is None:
+            radius = self.PLAYER_RADIUS
+            circle = pygame.Surface((2 * radius, 2 * radius), pygame.SRCALPHA)
+            pygame.draw.circle(circle, color, (radius, radius), radius)
+            self._circle_cache[key] = circle
+        return circle
 
     def send_position(self) -> None:
         """
-        Send the current player's position to the server.
+        Queue the current player's position for the server.
+
+        The message is sent when the network is flushed at the end of the frame.
         """
         if self.player is not None:
-            data = f"MOVE,{self.player.name},{self.player.x},{self.player.y}"
-            self.network.send(data)
+            self.network.queue(protocol.move(self.player.x, self.player.y))
 
-    def handle_joined(self, data: str) -> None:
+    def handle_accepted(self, payload: bytes) -> None:
         """
-        Handle a 'JOINED' message from the server.
+        Handle an 'ACCEPT' message from the server.
 
         Args:
-            data (str): The server message.
+            payload (bytes): The message payload holding our player id.
         """
-        name = data.split(",", 1)[1]
-        print(f"{name} joined the game!")
+        self.player_id = protocol.parse_player_id(payload)
 
-    def handle_left(self, data: str) -> None:
+    def handle_joined(self, payload: bytes) -> None:
         """
-        Handle a 'LEFT' message from the server.
+        Handle a 'JOINED' message from the server.
 
         Args:
-            data (str): The server message.
+            payload (bytes): The message payload holding the player's id and name.
         """
-        name = data.split(",", 1)[1]
-        print(f"{name} left the game.")
-        self.players = [player for player in self.players if player.name != name]
+        player_id, name = protocol.parse_player(payload)
+        self.player_names[player_id] = name
+        print(f"{name} joined the game!")
 
-    def _extract_all_data(self, data: str) -> list[str]:
+    def handle_left(self, payload: bytes) -> None:
         """
-        Extract player data from an 'UPDATE' message.
+        Handle a 'LEFT' message from the server.
 
         Args:
-            data (str): The server message.
-
-        Returns:
-            list[str]: List of player data strings.
+            payload (bytes): The message payload holding the player's id and name.
         """
-        return [
-            players_data.strip()
-            for players_data in data[7:].split(";")
-            if players_data.strip()
-        ]
+        player_id, name = protocol.parse_player(payload)
+        self.player_names.pop(player_id, None)
+        print(f"{name} left the game.")
+        left_player = self._by_name.pop(name, None)
+        if left_player is not None:
+            self.players = [
+                player for player in self.players if player is not left_player
+            ]
+            self._dirty = True
 
     def _update_or_add_player(self, name: str, x: int, y: int) -> None:
         """
@@ -381,78 +499,83 @@ class Game:
             x (int): Player's X position.
             y (int): Player's Y position.
         """
-        player = next((player for player in self.players if player.name == name), None)
+        player = self._by_name.get(name)
         if player:
-            player.x = x
-            player.y = y
+            if player.x != x or player.y != y:
+                player.x = x
+                player.y = y
+                self._dirty = True
         else:
             self.add_player(Player(name, x=x, y=y))
 
-    def _process_player_data(self, player_data: str) -> None:
-        """
-        Parse and process individual player data from the server.
-
-        Args:
-            player_data (str): Formatted player data string.
-        """
-        try:
-            name, x, y = self._parse_player_data(player_data)
-        except ValueError:
-            print(f"Malformed player data: {player_data}")
-            return None
-
-        if not (self.player and name == self.player.name):
-            self._update_or_add_player(name, x, y)
-
-    def _parse_player_data(self, player_data: str) -> tuple[str, int, int]:
-        """
-        Parse player data string into name and coordinates.
-
-        Args:
-            player_data (str): Formatted player data string.
-
-        Returns:
-                tuple[str, int, int]: (name, x, y)
-        """
-        name, x_str, y_str = player_data.split(",")
-        x, y = int(x_str), int(y_str)
-        return (name, x, y)
-
-    def handle_update(self, data: str) -> None:
+    def handle_update(self, payload: bytes) -> None:
         """
         Handle an 'UPDATE' message from the server.
 
         Args:
-            data (str): The server message.
+            payload (bytes): The message payload holding (id, x, y) records.
         """
-        all_data = self._extract_all_data(data)
-        for player_data in all_data:
-            self._process_player_data(player_data)
+        for player_id, x, y in protocol.parse_update(payload):
+            if player_id == self.player_id:
+                continue
+            name = self.player_names.get(player_id)
+            if name is not None:
+                self._update_or_add_player(name, x, y)
 
     def update_players(self) -> None:
         """
-        Receive and process messages from the server.
-        """
-        data: str = self.network.recv()
-        if data:
-            if data.startswith("JOINED,"):
-                self.handle_joined(data)
-            elif data.startswith("LEFT,"):
-                self.handle_left(data)
-            elif data.startswith("UPDATE;"):
-                self.handle_update(data)
+        Receive and process all pending messages from the server.
+
+        Draining the whole buffer every frame keeps the client from falling behind
+        when the server sends more than one message per frame.
+        """
+        recv = self.network.recv
+        while (frame := recv()) is not None:
+            opcode, payload = frame
+            try:
+                if opcode == protocol.ACCEPT:
+                    self.handle_accepted(payload)
+                elif opcode == protocol.JOINED:
+                    self.handle_joined(payload)
+                elif opcode == protocol.LEFT:
+                    self.handle_left(payload)
+                elif opcode == protocol.UPDATE:
+                    self.handle_update(payload)
+            except ValueError as e:
+                print(f"Malformed message from server: {e}")
 
     def start(self) -> None:
         """
         Main game loop: handle events, update state, and render.
         """
-        while self.running:
-            self.draw_screen()
-            self.handle_quit()
-            self.handle_move()
-            self.update_players()
+        _run_loop(self)
         pygame.quit()
 
 
+def _run_loop(game: Game) -> None:
+    """
+    Run the frames of the game until it stops.
+
+    The loop lives in a plain function with every per-frame callable bound to a
+    local, which JIT-enabled interpreters such as PyPy trace better than a method
+    reading attributes of self.
+
+    Args:
+        game (Game): The game to run.
+    """
+    get_events = pygame.event.get
+    draw_screen = game.draw_screen
+    handle_events = game.handle_events
+    handle_move = game.handle_move
+    flush = game.network.flush
+    update_players = game.update_players
+    while game.running:
+        draw_screen()
+        handle_events(get_events())
+        handle_move()
+        flush()
+        update_players()
+
+
 if __name__ == "__main__":
     Game().start()
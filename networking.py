@@ -1,21 +1,32 @@
+from __future__ import annotations
 import socket
 import threading
+from collections import deque
+from typing import Optional
+import protocol
 
 
 class NetWorking:
     """
     Handles TCP network connection for the game client.
 
-    This class manages connecting to a server, sending and receiving messages,
-    and buffering incoming data using a background thread.
+    This class manages connecting to a server, sending and receiving frames of the
+    binary protocol, and buffering incoming frames using a background thread.
 
     Attributes:
         host (str): The server host address.
         port (int): The server port.
         socket (socket.socket): The TCP socket for communication.
         connected (bool): Connection status.
-        lock (threading.Lock): Threading lock for safe access to shared data.
-        recv_buffer (list[str]): Buffer for received messages.
+        lock (threading.Lock): Threading lock serializing writes to the socket.
+        recv_buffer (deque[tuple[int, bytes]]): Buffer for received (opcode, payload)
+            frames. Filled only by the receive thread and drained only by the game
+            loop, so it needs no lock.
+        rx_buffer (bytearray): Preallocated buffer the socket receives into, large
+            enough for the biggest frame.
+        rx_length (int): Number of bytes at the start of rx_buffer not yet forming
+            a complete frame.
+        send_buffer (list[bytes]): Encoded frames queued until the next flush.
         running (bool): Indicates if the receive thread should keep running.
     """
 
@@ -32,34 +43,61 @@ class NetWorking:
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.connected = False
         self.lock = threading.Lock()
-        self.recv_buffer = []
+        self.recv_buffer: deque[tuple[int, bytes]] = deque()
+        self.rx_buffer = bytearray(protocol.MAX_FRAME_SIZE)
+        self.rx_length = 0
+        self.send_buffer: list[bytes] = []
         self.running = True
 
     def connect(self):
         """
         Connect to the server using the specified host and port.
 
-        Starts a background thread to receive messages from the server.
+        Disables Nagle's algorithm, since the game only sends small latency-sensitive
+        messages, and starts a background thread to receive messages from the server.
         """
         try:
             self.socket.connect((self.host, self.port))
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
             self.connected = True
             threading.Thread(target=self._receive_thread, daemon=True).start()
         except Exception as e:
             print(f"Connection error: {e}")
             self.connected = False
 
-    def send(self, message: str):
+    def send(self, frame: bytes):
         """
-        Send a string message to the server.
+        Send an encoded frame to the server immediately.
+
+        Any queued frames are sent first, so ordering is preserved.
+
+        Args:
+            frame (bytes): The frame to send, built with the protocol module.
+        """
+        self.queue(frame)
+        self.flush()
+
+    def queue(self, frame: bytes):
+        """
+        Queue an encoded frame to be sent on the next flush.
 
         Args:
-            message (str): The message to send.
+            frame (bytes): The frame to send, built with the protocol module.
         """
+        self.send_buffer.append(frame)
+
+    def flush(self):
+        """
+        Send all queued frames to the server in a single write.
+        """
+        if not self.send_buffer:
+            return
+        data = b"".join(self.send_buffer)
+        self.send_buffer.clear()
         if self.connected:
             try:
                 with self.lock:
-                    self.socket.sendall(message.encode("utf-8"))
+                    self.socket.sendall(data)
             except Exception as e:
                 print(f"Send error: {e}")
                 self.connected = False
@@ -68,36 +106,42 @@ class NetWorking:
         """
         Internal method: Continuously receive messages from the server in a background thread.
 
-        Splits incoming data by newlines and stores complete messages in the receive buffer.
+        Incoming bytes are received straight into a preallocated buffer, so a frame
+        split across several reads is reassembled without allocating per read. Only
+        complete frames are stored in the receive buffer, and the bytes of an
+        incomplete frame are moved to the front of the buffer.
         """
+        buffer = self.rx_buffer
+        view = memoryview(buffer)
         while self.connected and self.running:
             try:
-                data = self.socket.recv(4096)
-                if not data:
+                received = self.socket.recv_into(view[self.rx_length :])
+                if not received:
                     self.connected = False
                     break
-                text = data.decode("utf-8")
-
-                for msg in text.split("\n"):
-                    if msg.strip():
-                        with self.lock:
-                            self.recv_buffer.append(msg.strip())
+                length = self.rx_length + received
+                frames, consumed = protocol.read_frames(view[:length])
+                self.recv_buffer.extend(frames)
+                self.rx_length = length - consumed
+                if consumed and self.rx_length:
+                    buffer[: self.rx_length] = buffer[consumed:length]
             except Exception as e:
                 print(f"Receive error: {e}")
                 self.connected = False
                 break
 
-    def recv(self) -> str:
+    def recv(self) -> Optional[tuple[int, bytes]]:
         """
-        Retrieve the oldest message from the receive buffer, if available.
+        Retrieve the oldest frame from the receive buffer, if available.
 
         Returns:
-            str: The next message from the server, or an empty string if no messages are available.
+            Optional[tuple[int, bytes]]: The next (opcode, payload) frame from the server,
+                or None if no frames are available.
         """
-        with self.lock:
-            if self.recv_buffer:
-                return self.recv_buffer.pop(0)
-        return ""
+        try:
+            return self.recv_buffer.popleft()
+        except IndexError:
+            return None
 
     def close(self):
         """
@@ -115,4 +159,4 @@ class NetWorking:
 if __name__ == "__main__":
     net = NetWorking()
     net.connect()
-    net.send("JOIN,Ali")
+    net.send(protocol.join("Ali"))
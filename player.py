@@ -2,7 +2,7 @@ import attr
 from typing import Any
 
 
-@attr.s
+@attr.s(slots=True, weakref_slot=False)
 class Player:
     """
     Represents a player in the game.
@@ -31,12 +31,3 @@ class Player:
         """
         self.x += dx
         self.y += dy
-
-    def position(self) -> tuple[int, int]:
-        """
-        Get the current position of the player.
-
-        Returns:
-            tuple[int, int]: The (x, y) position of the player.
-        """
-        return (self.x, self.y)
@@ -0,0 +1,252 @@
+"""
+Binary wire protocol shared by the game client and the server.
+
+Every message is a frame made of a 3-byte header (1-byte opcode, 2-byte payload
+length) followed by the payload. Players are identified on the wire by a 1-byte
+id that the server assigns when they join.
+
+Messages:
+    JOIN    (client -> server): UTF-8 player name.
+    ACCEPT  (server -> joining client): the id assigned to that client.
+    JOINED  (server -> clients): player id followed by the UTF-8 player name.
+    LEFT    (server -> clients): player id followed by the UTF-8 player name.
+    MOVE    (client -> server): x and y of the sender.
+    UPDATE  (server -> clients): one (id, x, y) record per player.
+"""
+
+from __future__ import annotations
+import struct
+from typing import Iterator
+
+JOIN: int = 1
+ACCEPT: int = 2
+JOINED: int = 3
+LEFT: int = 4
+MOVE: int = 5
+UPDATE: int = 6
+
+MAX_PLAYERS: int = 256
+MAX_NAME_LENGTH: int = 16
+
+HEADER = struct.Struct("<BH")
+MAX_FRAME_SIZE: int = HEADER.size + 0xFFFF
+PLAYER_ID = struct.Struct("<B")
+POSITION = struct.Struct("<hh")
+PLAYER = struct.Struct("<Bhh")
+
+
+def pack(opcode: int, payload: bytes = b"") -> bytes:
+    """
+    Build a frame from an opcode and its payload.
+
+    Args:
+        opcode (int): The message type.
+        payload (bytes): The message body.
+
+    Returns:
+        bytes: The encoded frame.
+
+    Raises:
+        ValueError: If the payload does not fit in a frame.
+    """
+    if len(payload) > 0xFFFF:
+        raise ValueError(f"Payload too large: {len(payload)} bytes")
+    return HEADER.pack(opcode, len(payload)) + payload
+
+
+def read_frames(view: memoryview) -> tuple[list[tuple[int, bytes]], int]:
+    """
+    Read all complete frames from the start of a buffer without modifying it.
+
+    Args:
+        view (memoryview): Received bytes, starting at a frame boundary.
+
+    Returns:
+        tuple[list[tuple[int, bytes]], int]: (opcode, payload) for every complete
+            frame, and the number of bytes they occupy.
+    """
+    frames = []
+    start = 0
+    end = len(view)
+    # Slicing the view copies each payload once, straight into its bytes object
+    while end - start >= HEADER.size:
+        opcode, length = HEADER.unpack_from(view, start)
+        payload_start = start + HEADER.size
+        if end - payload_start < length:
+            break
+        start = payload_start + length
+        frames.append((opcode, view[payload_start:start].tobytes()))
+    return (frames, start)
+
+
+def split_frames(buffer: bytearray) -> list[tuple[int, bytes]]:
+    """
+    Extract all complete frames from a receive buffer.
+
+    Consumed bytes are removed from the buffer; an incomplete trailing frame is
+    left in place until the rest of it arrives.
+
+    Args:
+        buffer (bytearray): Bytes received from the peer.
+
+    Returns:
+        list[tuple[int, bytes]]: (opcode, payload) for every complete frame.
+    """
+    with memoryview(buffer) as view:
+        frames, consumed = read_frames(view)
+    if consumed:
+        del buffer[:consumed]
+    return frames
+
+
+def join(name: str) -> bytes:
+    """
+    Build a JOIN frame.
+
+    Args:
+        name (str): The joining player's name.
+
+    Returns:
+        bytes: The encoded frame.
+    """
+    return pack(JOIN, name.encode("utf-8"))
+
+
+def accept(player_id: int) -> bytes:
+    """
+    Build an ACCEPT frame.
+
+    Args:
+        player_id (int): The id assigned to the joining client.
+
+    Returns:
+        bytes: The encoded frame.
+    """
+    return pack(ACCEPT, PLAYER_ID.pack(player_id))
+
+
+def joined(player_id: int, name: str) -> bytes:
+    """
+    Build a JOINED frame.
+
+    Args:
+        player_id (int): The player's id.
+        name (str): The player's name.
+
+    Returns:
+        bytes: The encoded frame.
+    """
+    return pack(JOINED, PLAYER_ID.pack(player_id) + name.encode("utf-8"))
+
+
+def left(player_id: int, name: str) -> bytes:
+    """
+    Build a LEFT frame.
+
+    Args:
+        player_id (int): The player's id.
+        name (str): The player's name.
+
+    Returns:
+        bytes: The encoded frame.
+    """
+    return pack(LEFT, PLAYER_ID.pack(player_id) + name.encode("utf-8"))
+
+
+def move(x: int, y: int) -> bytes:
+    """
+    Build a MOVE frame.
+
+    Args:
+        x (int): The player's X position.
+        y (int): The player's Y position.
+
+    Returns:
+        bytes: The encoded frame.
+    """
+    return pack(MOVE, POSITION.pack(x, y))
+
+
+def update(records: bytes) -> bytes:
+    """
+    Build an UPDATE frame.
+
+    Args:
+        records (bytes): Concatenated PLAYER records of all players.
+
+    Returns:
+        bytes: The encoded frame.
+    """
+    return pack(UPDATE, records)
+
+
+def parse_player_id(payload: bytes) -> int:
+    """
+    Parse the payload of an ACCEPT frame.
+
+    Args:
+        payload (bytes): The frame payload.
+
+    Returns:
+        int: The player id.
+
+    Raises:
+        ValueError: If the payload is malformed.
+    """
+    if len(payload) != PLAYER_ID.size:
+        raise ValueError(f"Invalid player id payload: {payload!r}")
+    return payload[0]
+
+
+def parse_player(payload: bytes) -> tuple[int, str]:
+    """
+    Parse the payload of a JOINED or LEFT frame.
+
+    Args:
+        payload (bytes): The frame payload.
+
+    Returns:
+        tuple[int, str]: (player_id, name)
+
+    Raises:
+        ValueError: If the payload is malformed.
+    """
+    if len(payload) <= PLAYER_ID.size:
+        raise ValueError(f"Invalid player payload: {payload!r}")
+    return (payload[0], payload[PLAYER_ID.size :].decode("utf-8"))
+
+
+def parse_position(payload: bytes) -> tuple[int, int]:
+    """
+    Parse the payload of a MOVE frame.
+
+    Args:
+        payload (bytes): The frame payload.
+
+    Returns:
+        tuple[int, int]: (x, y)
+
+    Raises:
+        ValueError: If the payload is malformed.
+    """
+    if len(payload) != POSITION.size:
+        raise ValueError(f"Invalid position payload: {payload!r}")
+    return POSITION.unpack(payload)
+
+
+def parse_update(payload: bytes) -> Iterator[tuple[int, int, int]]:
+    """
+    Parse the payload of an UPDATE frame.
+
+    Args:
+        payload (bytes): The frame payload.
+
+    Returns:
+        Iterator[tuple[int, int, int]]: (player_id, x, y) for every player.
+
+    Raises:
+        ValueError: If the payload is malformed.
+    """
+    if len(payload) % PLAYER.size:
+        raise ValueError(f"Invalid update payload length: {len(payload)}")
+    return PLAYER.iter_unpack(payload)
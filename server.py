@@ -1,5 +1,7 @@
+import selectors
 import socket
-import threading
+from typing import Optional
+import protocol
 
 
 class Server:
@@ -7,8 +9,14 @@ class Server:
     A simple TCP server for multiplayer game synchronization.
 
     Handles client connections, player state management, and broadcasting updates to all clients.
+    All sockets are served from a single thread by a selector (epoll on Linux), so the
+    player state needs no locking.
     """
 
+    SELECT_TIMEOUT: float = 0.5
+    # Most unsent bytes kept for a client before it is considered stuck
+    MAX_PENDING_SEND: int = 1 << 20
+
     def __init__(self, host="localhost", port=12345):
         """
         Initialize the server and prepare to accept connections.
@@ -23,124 +31,311 @@ class Server:
         self.port = port
         self.clients = []
         self.players = {}
-        self.lock = threading.Lock()
+        # Encoded PLAYER record of each player, reused for every UPDATE
+        self.records = {}
+        # Received bytes of each client that do not form a complete frame yet
+        self.buffers = {}
+        # Bytes of each client the socket did not accept yet, sent once it is writable
+        self.outgoing = {}
+        # Every client is read into this buffer; only incomplete frames are copied out
+        self.recv_buffer = bytearray(4096)
+        self.recv_view = memoryview(self.recv_buffer)
+        # Handler of each opcode a client may send
+        self.handlers = {
+            protocol.JOIN: self.handle_join,
+            protocol.MOVE: self.handle_move,
+        }
+        self.selector = selectors.DefaultSelector()
         self.running = True
 
-    def broadcast(self, message, exclude_socket=None):
+    def send(self, client_socket, frame):
+        """
+        Send an encoded frame to a single client without blocking.
+
+        Whatever the socket does not accept right away is queued and sent once the
+        socket becomes writable, so a client that stops reading cannot stall the
+        server.
+
+        Args:
+            client_socket (socket.socket): The client's socket.
+            frame (bytes): The encoded frame.
+
+        Returns:
+            bool: True if the frame was sent or queued, False if the connection
+                failed or the client has too much unsent data.
+        """
+        pending = self.outgoing[client_socket]
+        if pending:
+            # Keep frames in order behind the data that is already waiting
+            pending += frame
+        else:
+            try:
+                sent = client_socket.send(frame)
+            except BlockingIOError:
+                sent = 0
+            except OSError:
+                return False
+            if sent == len(frame):
+                return True
+            pending += memoryview(frame)[sent:]
+            self.selector.modify(
+                client_socket,
+                selectors.EVENT_READ | selectors.EVENT_WRITE,
+                self.handle_client,
+            )
+        if len(pending) > self.MAX_PENDING_SEND:
+            print("Client is not reading, dropping connection.")
+            return False
+        return True
+
+    def flush(self, client_socket):
         """
-        Send a message to all connected clients, optionally excluding one socket.
+        Send queued data to a client whose socket became writable.
 
         Args:
-            message (str): The message to broadcast.
+            client_socket (socket.socket): The client's socket.
+
+        Returns:
+            bool: True if the client is still connected, False if it was disconnected.
+        """
+        pending = self.outgoing.get(client_socket)
+        if pending is None:
+            # Disconnected by an earlier event of the same selector pass
+            return False
+        try:
+            sent = client_socket.send(pending)
+        except BlockingIOError:
+            return True
+        except OSError:
+            self.disconnect(client_socket)
+            return False
+        del pending[:sent]
+        if not pending:
+            self.selector.modify(
+                client_socket, selectors.EVENT_READ, self.handle_client
+            )
+        return True
+
+    def broadcast(self, frame, exclude_socket=None):
+        """
+        Send an encoded frame to all joined players, optionally excluding one socket.
+
+        Clients that have not joined yet would not know the player ids used in the
+        frames, so they only start receiving broadcasts once they join. Clients that
+        fail to receive the frame are disconnected.
+
+        Args:
+            frame (bytes): The encoded frame to broadcast.
             exclude_socket (socket.socket, optional): A client socket to exclude from broadcast.
         """
-        with self.lock:
-            for client in self.clients[:]:
-                if client != exclude_socket:
-                    try:
-                        client.sendall(message.encode("utf-8"))
-                    except Exception:
-                        self.clients.remove(client)
-                        if client in self.players:
-                            del self.players[client]
-                        client.close()
+        failed = [
+            client
+            for client in self.players
+            if client != exclude_socket and not self.send(client, frame)
+        ]
+        for client in failed:
+            self.disconnect(client)
+
+    def broadcast_update(self):
+        """
+        Send the positions of all players to all connected clients.
+
+        The message is assembled from the cached per-player records, so only the
+        player that moved has been re-encoded.
+        """
+        self.broadcast(protocol.update(b"".join(self.records.values())))
+
+    def accept_client(self, server_socket):
+        """
+        Accept a pending connection and start watching it for messages.
+
+        Args:
+            server_socket (socket.socket): The listening socket.
+        """
+        try:
+            client_socket, address = server_socket.accept()
+        except OSError:
+            return
+        print("New connection from:", address)
+        client_socket.setblocking(False)
+        self.clients.append(client_socket)
+        self.buffers[client_socket] = bytearray()
+        self.outgoing[client_socket] = bytearray()
+        self.selector.register(client_socket, selectors.EVENT_READ, self.handle_client)
 
-    def handle_client(self, client_socket, address):
+    def handle_client(self, client_socket):
         """
-        Handle communication with a single client.
+        Handle data that arrived from a single client.
 
-        Processes JOIN and MOVE commands, updates player state,
-        and broadcasts changes to all clients.
+        Data is received into the shared receive buffer and complete frames are
+        read from it in place. Only the bytes of an incomplete frame are kept per
+        client until the rest of it arrives.
 
         Args:
             client_socket (socket.socket): The client's socket.
-            address (tuple): The client's (IP, port) address.
         """
         try:
-            while True:
-                data = client_socket.recv(1024).decode("utf-8")
-                if not data:
-                    break
-                parts = data.split(",")
-                if parts[0] == "JOIN" and len(parts) == 2:
-                    name = parts[1].strip()
-                    with self.lock:
-                        self.players[client_socket] = {"name": name, "x": 0, "y": 0}
-                    join_msg = f"JOINED,{name}"
-                    self.broadcast(join_msg, exclude_socket=None)
-                elif parts[0] == "MOVE" and len(parts) == 4:
-                    name, x, y = parts[1], parts[2], parts[3]
-                    try:
-                        x = int(x)
-                        y = int(y)
-                        with self.lock:
-                            self.players[client_socket] = {"name": name, "x": x, "y": y}
-                        with self.lock:
-                            all_data = ";".join(
-                                f"{info['name']},{info['x']},{info['y']}"
-                                for info in self.players.values()
-                            )
-                        self.broadcast(f"UPDATE;{all_data}")
-                    except Exception:
-                        continue
-                else:
-                    continue
+            received = client_socket.recv_into(self.recv_view)
+        except BlockingIOError:
+            return
         except Exception as e:
-            print(f"Error with {address}: {e}")
-        finally:
-            with self.lock:
-                if client_socket in self.clients:
-                    self.clients.remove(client_socket)
-                player = self.players.pop(client_socket, None)
-            client_socket.close()
-            if player:
-                leave_msg = f"LEFT,{player['name']}"
-                self.broadcast(leave_msg, exclude_socket=None)
+            print(f"Error with client: {e}")
+            received = 0
+        if not received:
+            self.disconnect(client_socket)
+            return
+        pending = self.buffers[client_socket]
+        if pending:
+            pending += self.recv_view[:received]
+            frames = protocol.split_frames(pending)
+        else:
+            frames, consumed = protocol.read_frames(self.recv_view[:received])
+            pending += self.recv_view[consumed:received]
+        for opcode, payload in frames:
+            handler = self.handlers.get(opcode)
+            if handler is None:
+                continue
+            try:
+                handler(client_socket, payload)
+            except ValueError as e:
+                print(f"Malformed message from client: {e}")
+            if client_socket not in self.clients:
+                return
+
+    def handle_join(self, client_socket, payload):
+        """
+        Register a new player and announce it to all clients.
+
+        The joining client receives its player id and the players already in the game.
+
+        Args:
+            client_socket (socket.socket): The client's socket.
+            payload (bytes): The UTF-8 player name.
+
+        Raises:
+            ValueError: If the name is not valid UTF-8 or is too long.
+        """
+        name = payload.decode("utf-8").strip()
+        if not name or client_socket in self.players:
+            return
+        if len(name) > protocol.MAX_NAME_LENGTH:
+            raise ValueError(f"Player name too long: {len(name)} characters")
+        player_id = self.free_player_id()
+        if player_id is None:
+            print(f"Server full, rejecting {name}")
+            self.disconnect(client_socket)
+            return
+        roster = b"".join(
+            protocol.joined(info["id"], info["name"]) for info in self.players.values()
+        )
+        self.players[client_socket] = {"id": player_id, "name": name, "x": 0, "y": 0}
+        self.records[client_socket] = protocol.PLAYER.pack(player_id, 0, 0)
+        if not self.send(client_socket, protocol.accept(player_id) + roster):
+            self.disconnect(client_socket)
+            return
+        self.broadcast(protocol.joined(player_id, name), exclude_socket=None)
+
+    def handle_move(self, client_socket, payload):
+        """
+        Update a player's position and broadcast all positions.
+
+        Args:
+            client_socket (socket.socket): The client's socket.
+            payload (bytes): The encoded position.
+
+        Raises:
+            ValueError: If the payload is malformed.
+        """
+        info = self.players.get(client_socket)
+        if info is None:
+            return
+        x, y = protocol.parse_position(payload)
+        info["x"] = x
+        info["y"] = y
+        self.records[client_socket] = protocol.PLAYER.pack(info["id"], x, y)
+        self.broadcast_update()
+
+    def free_player_id(self) -> Optional[int]:
+        """
+        Find the lowest player id not used by a connected player.
+
+        Returns:
+            Optional[int]: A free player id, or None if the server is full.
+        """
+        used = {info["id"] for info in self.players.values()}
+        return next((i for i in range(protocol.MAX_PLAYERS) if i not in used), None)
+
+    def disconnect(self, client_socket):
+        """
+        Close a client connection and tell the remaining clients the player left.
+
+        Args:
+            client_socket (socket.socket): The client's socket.
+        """
+        if client_socket not in self.clients:
+            return
+        self.clients.remove(client_socket)
+        self.selector.unregister(client_socket)
+        player = self.players.pop(client_socket, None)
+        self.records.pop(client_socket, None)
+        self.buffers.pop(client_socket, None)
+        self.outgoing.pop(client_socket, None)
+        client_socket.close()
+        if player:
+            self.broadcast(
+                protocol.left(player["id"], player["name"]), exclude_socket=None
+            )
 
     def start(self):
         """
-        Start the server and accept incoming connections.
+        Start the server and serve all connections until it is stopped.
 
-        For each new client, a separate thread is started to handle communication.
+        The listening socket and every client socket are registered with the
+        selector, and each ready socket is dispatched to its handler.
         """
         self.server_socket.bind((self.host, self.port))
         self.server_socket.listen(5)
+        self.server_socket.setblocking(False)
+        self.selector.register(
+            self.server_socket, selectors.EVENT_READ, self.accept_client
+        )
         print("Server started.")
         try:
             while self.running:
-                try:
-                    client_socket, address = self.server_socket.accept()
-                    print("New connection from:", address)
-                except OSError:
-                    break
-                with self.lock:
-                    self.clients.append(client_socket)
-                threading.Thread(
-                    target=self.handle_client,
-                    args=(client_socket, address),
-                    daemon=True,
-                ).start()
+                for key, mask in self.selector.select(timeout=self.SELECT_TIMEOUT):
+                    # Only client sockets are ever watched for writability
+                    if mask & selectors.EVENT_WRITE and not self.flush(key.fileobj):
+                        continue
+                    if mask & selectors.EVENT_READ:
+                        key.data(key.fileobj)
         finally:
             print("Server shutting down.")
-            with self.lock:
-                for client in self.clients:
-                    try:
-                        client.close()
-                    except Exception:
-                        pass
-                self.clients.clear()
-                self.players.clear()
+            for client in self.clients:
+                try:
+                    client.close()
+                except Exception:
+                    pass
+            self.clients.clear()
+            self.players.clear()
+            self.records.clear()
+            self.buffers.clear()
+            self.outgoing.clear()
+            self.selector.close()
             self.server_socket.close()
 
     def stop(self):
         """
         Stop the server and close all connections.
+
+        The serving loop notices the request within SELECT_TIMEOUT seconds.
         """
         self.running = False
-        self.server_socket.close()
 
 
-if __name__ == "__main__":
+def main():
+    """
+    Run a server on the default address until interrupted.
+    """
     server = None
     try:
         server = Server()
@@ -150,3 +345,7 @@ if __name__ == "__main__":
         if server is not None:
             server.stop()
         print("Server stopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,40 @@
 import socket
+import struct
 from colorama import init, Fore, Style
 
 init(autoreset=True)
 
+# إطار الإحداثيات الثنائي: رمز العملية (بايت واحد) ثم x و y
+# يجب أن يطابق التعريف في server.py
+FRAME = struct.Struct('<Bdd')
+OP_MOVE = 1
+OP_EXIT = 2
+
 client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 
 try:
     client_socket.connect(('localhost', 12345))
     name = input(Fore.YELLOW + "Enter your name: ")
-    client_socket.send(name.encode('utf-8'))
+    client_socket.send((name + "\n").encode('utf-8'))
     
     print(Fore.CYAN + "Connected to server. Type 'exit' to quit.")
 
     while True:
-        message = input(Fore.YELLOW + "Enter message (e.g. 3+4) -> ")
+        message = input(Fore.YELLOW + "Enter coordinates (e.g. 3,4) -> ")
         if message.lower() == "exit":
             print(Fore.MAGENTA + "Closing connection...")
+            client_socket.send(FRAME.pack(OP_EXIT, 0, 0))
             break
         if message.strip() == "":
             print(Fore.RED + "Empty message! Please enter something.")
             continue
+        try:
+            x, y = (float(part) for part in message.split(','))
+        except ValueError:
+            print(Fore.RED + "Invalid coordinates! Use the format x,y")
+            continue
 
-        client_socket.send(message.encode('utf-8'))
+        client_socket.send(FRAME.pack(OP_MOVE, x, y))
 
         response = client_socket.recv(1024).decode('utf-8')
         if response.startswith('Error'):
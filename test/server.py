@@ -1,8 +1,14 @@
-import socket
-import threading
+import asyncio
 import logging
+import logging.handlers
+import queue
+import socket
+import struct
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 from colorama import init, Fore, Style
-import traceback
 
 init(autoreset=True)
 
@@ -14,10 +20,11 @@ class ColorFormatter(logging.Formatter):
         logging.ERROR: Fore.RED,
         logging.CRITICAL: Fore.RED + Style.BRIGHT,
     }
+    RESET = Style.RESET_ALL
+
     def format(self, record):
-        color = self.COLORS.get(record.levelno, "")
-        message = super().format(record)
-        return color + message + Style.RESET_ALL
+        # بناء السلسلة النهائية مرة واحدة بدلاً من جمعها على مرحلتين
+        return ''.join((self.COLORS.get(record.levelno, ""), super().format(record), self.RESET))
 
 file_handler = logging.FileHandler("server.log", encoding='utf-8')
 file_handler.setFormatter(logging.Formatter('[%(asctime)s][%(levelname)s][%(threadName)s] %(message)s', "%Y-%m-%d %H:%M:%S"))
@@ -26,81 +33,197 @@ handler = logging.StreamHandler()
 formatter = ColorFormatter('[%(asctime)s][%(levelname)s][%(threadName)s] %(message)s', "%H:%M:%S")
 handler.setFormatter(formatter)
 logger = logging.getLogger("server")
-logger.setLevel(logging.DEBUG)
-logger.addHandler(handler)
-logger.addHandler(file_handler)
-
-server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-server_socket.bind(('localhost', 12345))
-server_socket.listen(5)
+logger.setLevel(logging.INFO)
+# الخيط الرئيسي يضع السجلات في طابور فقط، والكتابة على الشاشة والملف تتم في خيط خلفي
+log_queue = queue.SimpleQueue()
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
+log_listener = logging.handlers.QueueListener(log_queue, handler, file_handler)
+log_listener.start()
 
-logger.info("Listening on port 12345")
+# إطار الإحداثيات الثنائي: رمز العملية (بايت واحد) ثم x و y
+# يجب أن يطابق التعريف في client.py
+FRAME = struct.Struct('<Bdd')
+OP_MOVE = 1
+OP_EXIT = 2
 
 # قواميس لتخزين بيانات اللاعبين والاتصالات
 players = {}   # name -> (x, y)
-connections = {}  # name -> client_socket
-lock = threading.Lock()
+entries = {}   # name -> b"name:x,y" جاهزة للبث
+connections = {}  # name -> asyncio.StreamWriter
+
+# آخر رسالة بث مرمّزة، تُحذف عند أي تغيير في players
+broadcast_cache = None
+
+def invalidate_broadcast():
+    """حذف رسالة البث المخزنة بعد تغيير بيانات اللاعبين."""
+    global broadcast_cache
+    broadcast_cache = None
+
+def players_payload():
+    """إرجاع قائمة الإحداثيات مرمّزة، مع إعادة بنائها فقط إذا تغيرت."""
+    global broadcast_cache
+    if broadcast_cache is None:
+        # كل لاعب مرمّز مسبقاً، فإعادة البناء مجرد دمج للبايتات
+        broadcast_cache = b"|".join(entries.values())
+    return broadcast_cache
+
+# أقصى حجم للبيانات المنتظرة في مخزن إرسال اتصال واحد قبل فصله
+MAX_PENDING_SEND = 1 << 20
 
 def broadcast_players():
     """إرسال قائمة الإحداثيات لجميع اللاعبين."""
-    with lock:
-        data = []
-        for name, (x, y) in players.items():
-            data.append(f"{name}:{x},{y}")
-        message = "|".join(data)
-        for sock in connections.values():
-            try:
-                sock.sendall(message.encode('utf-8'))
-            except:
-                pass  # قد يكون الاتصال أغلق
-
-def handle_client(client_socket, addr):
+    payload = players_payload()
+    # الكتابة لا تنتظر أحداً: ما لا يُرسل فوراً يبقى في مخزن الاتصال حتى يصبح
+    # المقبس قابلاً للكتابة، فلا يؤخر لاعب بطيء البث إلى الآخرين
+    # الاتصالات الميتة لا تُحذف هنا، بل في finally داخل handle_client الخاص بها
+    for name, writer in connections.items():
+        if writer.is_closing():
+            # الاتصال انقطع (EPIPE أو ECONNRESET) ولم يُزل بعد
+            continue
+        if writer.transport.get_write_buffer_size() > MAX_PENDING_SEND:
+            logger.warning(f"Client {name} is not reading, closing connection.")
+            # close() ينتظر إرسال البيانات المتبقية، وهذا لن يحدث مع عميل لا يقرأ
+            writer.transport.abort()
+            continue
+        writer.write(payload)
+
+# مدة النبضة بين رسائل البث (حوالي 60 مرة في الثانية)
+BROADCAST_INTERVAL = 0.016
+broadcast_dirty = False
+
+def mark_dirty():
+    """طلب بث قائمة الإحداثيات في النبضة القادمة."""
+    global broadcast_dirty
+    broadcast_dirty = True
+
+async def broadcast_tick():
+    """بث واحد في كل نبضة يجمع كل التحديثات التي وصلت خلالها."""
+    global broadcast_dirty
+    while True:
+        await asyncio.sleep(BROADCAST_INTERVAL)
+        if broadcast_dirty:
+            broadcast_dirty = False
+            broadcast_players()
+
+# حجم مخازن الإرسال والاستقبال لكل اتصال. النواة تقيّدها بـ net.core.wmem_max
+# و net.core.rmem_max، لذلك يجب رفعهما أيضاً، مثلاً:
+#   sysctl -w net.core.wmem_max=1048576 net.core.rmem_max=1048576
+SOCKET_BUFFER_SIZE = 1 << 20
+# أقصى مدة (بالمللي ثانية) لبقاء بيانات مرسلة دون تأكيد قبل أن تغلق النواة الاتصال
+TCP_USER_TIMEOUT_MS = 15000
+
+def tune_socket(sock):
+    """تعطيل خوارزمية Nagle وتكبير مخازن الاتصال وتحديد مهلة للاتصالات العالقة."""
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+    if hasattr(socket, 'TCP_USER_TIMEOUT'):  # Linux فقط
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_USER_TIMEOUT, TCP_USER_TIMEOUT_MS)
+
+async def handle_client(reader, writer):
+    addr = writer.get_extra_info('peername')
+    tune_socket(writer.get_extra_info('socket'))
+    name = ""
     try:
-        client_socket.send("Welcome! Send your name:".encode('utf-8'))
-        name = client_socket.recv(1024).decode('utf-8').strip()
+        writer.write("Welcome! Send your name:".encode('utf-8'))
+        await writer.drain()
+        # الاسم سطر نصي، وبعده تصل إطارات الإحداثيات
+        name = (await reader.readline()).decode('utf-8').strip()
         if not name:
             logger.warning(f"Empty name from {addr}, closing connection.")
-            client_socket.close()
+            writer.close()
             return
 
-        with lock:
-            connections[name] = client_socket
+        connections[name] = writer
         logger.info(f'Connected: {addr} as {name}')
-        client_socket.send(f"Hello {name}! Send coordinates (x,y). Send 'exit' to leave.".encode('utf-8'))
+        writer.write(f"Hello {name}! Send coordinates (x,y). Send 'exit' to leave.".encode('utf-8'))
+        await writer.drain()
 
+        buffer = bytearray()
         while True:
-            data = client_socket.recv(1024).decode('utf-8').strip()
-            if not data or data.lower() == "exit":
+            data = await reader.read(1024)
+            if not data:
                 logger.warning(f"Client {name} ({addr}) disconnected.")
                 break
-            logger.debug(f"Coordinates from {name} ({addr}): {data}")
-            try:
-                # تحقق من أن البيانات على شكل x,y
-                parts = data.split(',')
-                if len(parts) != 2:
-                    raise ValueError("Input must be in format: x,y")
-                x, y = float(parts[0].strip()), float(parts[1].strip())
-                with lock:
-                    players[name] = (x, y)
-                broadcast_players()
-                logger.info(f"Updated coordinates for {name}: {x},{y} and broadcasted to all clients.")
-            except Exception as coord_err:
-                client_socket.send(f'Error: {coord_err}'.encode('utf-8'))
-                logger.error(f'Error: {coord_err}\n{traceback.format_exc()}')
+            buffer += data
+            # معالجة جميع الإطارات الكاملة المستلمة دفعة واحدة
+            end = len(buffer) - len(buffer) % FRAME.size
+            moved = False
+            exiting = False
+            for op, x, y in FRAME.iter_unpack(buffer[:end]):
+                if op == OP_EXIT:
+                    exiting = True
+                    break
+                try:
+                    if op != OP_MOVE:
+                        raise ValueError(f"Unknown opcode: {op}")
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug(f"Coordinates from {name} ({addr}): {x},{y}")
+                    if players.get(name) != (x, y):
+                        players[name] = (x, y)
+                        entries[name] = f"{name}:{x},{y}".encode('utf-8')
+                        invalidate_broadcast()
+                    moved = True
+                except ValueError as coord_err:
+                    # خطأ متوقع من العميل، لا حاجة لتتبع المكدس
+                    writer.write(f'Error: {coord_err}'.encode('utf-8'))
+                    logger.warning(f'Bad coordinates from {name}: {coord_err}')
+                except Exception as coord_err:
+                    writer.write(f'Error: {coord_err}'.encode('utf-8'))
+                    logger.error(f'Error: {coord_err}', exc_info=True)
+            del buffer[:end]
+            if moved:
+                mark_dirty()
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Updated coordinates for {name}: {x},{y}, broadcasting on next tick.")
+            if exiting:
+                logger.warning(f"Client {name} ({addr}) disconnected.")
+                break
+    except (ConnectionResetError, BrokenPipeError) as e:
+        logger.warning(f"Client {name} ({addr}) connection lost: {e}")
     except Exception as e:
-        logger.error(f"Error with client {addr}: {e}\n{traceback.format_exc()}")
+        logger.error(f"Error with client {addr}: {e}", exc_info=True)
     finally:
-        with lock:
-            players.pop(name, None)
-            connections.pop(name, None)
-        broadcast_players()
-        client_socket.close()
+        # حلقة الأحداث تعمل في خيط واحد، لذلك لا حاجة إلى قفل.
+        # إذا عاد لاعب بنفس الاسم فالبيانات له، فلا نحذفها
+        if connections.get(name) is writer:
+            del connections[name]
+            if players.pop(name, None) is not None:
+                del entries[name]
+                invalidate_broadcast()
+            mark_dirty()
+        writer.close()
         logger.info(f"Connection with {addr} closed.")
 
+def raise_fd_limit():
+    """رفع الحد المسموح من الملفات المفتوحة إلى أقصاه لاستيعاب اتصالات كثيرة."""
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == hard:
+        return
+    try:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ValueError, OSError) as e:
+        # بعض الأنظمة (مثل macOS) ترفض الحد غير المحدود
+        logger.warning(f"Could not raise open file limit: {e}")
+        return
+    logger.info(f"Raised open file limit from {soft} to {hard}")
+
+async def main():
+    raise_fd_limit()
+    # طابور قبول بأقصى حجم يسمح به النظام لتحمّل موجات الاتصال المفاجئة
+    server = await asyncio.start_server(handle_client, 'localhost', 12345, backlog=socket.SOMAXCONN)
+    logger.info("Listening on port 12345")
+    # الاحتفاظ بمرجع للمهمة حتى لا يجمعها جامع القمامة
+    tick = asyncio.create_task(broadcast_tick())
+    async with server:
+        await server.serve_forever()
+
 try:
-    while True:
-        client_socket, addr = server_socket.accept()
-        client_thread = threading.Thread(target=handle_client, args=(client_socket, addr), daemon=True)
-        client_thread.start()
+    asyncio.run(main())
 except KeyboardInterrupt:
 	pass
+finally:
+    # كتابة السجلات المتبقية في الطابور قبل الخروج
+    log_listener.stop()